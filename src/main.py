@@ -6,36 +6,143 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))  # DON'T CHANGE THIS !!!
 
-from flask import Flask, render_template, send_from_directory, jsonify, request
+from flask import Blueprint, Flask, abort, render_template, send_file, send_from_directory, request
+from flask.json.provider import DefaultJSONProvider
 import logging
 from logging.handlers import RotatingFileHandler
 import threading
+import concurrent.futures
+import queue
+import heapq
+import bisect
+import atexit
+import contextlib
+import gc
 import time
 import json
 import datetime
 import csv
+import numpy as np
+import orjson
 import requests
+import websocket
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import hmac
 import hashlib
+import operator
+import copy
+from functools import reduce, wraps
 import base64
-from io import StringIO
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson so Flask internals skip the stdlib encoder"""
+
+    def dumps_bytes(self, obj):
+        """Serialize obj straight to bytes, the form response bodies need"""
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
 
 # Create Flask app
 app = Flask(__name__)
+app.json_provider_class = ORJSONProvider
+app.json = ORJSONProvider(app)
+app.url_map.strict_slashes = False
 app.config['SECRET_KEY'] = os.urandom(24)
 
 # Global variables
 config = {}
+config_lock = threading.Lock()
+safe_config_cache = None
+config_save_queue = queue.Queue()
+config_save_thread = None
 active_trades = {}
 trade_cooldowns = {}
+cooldown_heap = []
+cooldown_lock = threading.Lock()
 price_update_thread = None
 balance_update_thread = None
 auto_trade_thread = None
 stop_threads = False
+gc_pause_count = 0
+gc_pause_lock = threading.Lock()
+trade_log_queue = queue.Queue()
+trade_log_thread = None
+trade_index = []
+trades_by_status = defaultdict(list)
+trades_by_coin = defaultdict(list)
+trade_stats = {'total_trades': 0, 'completed_trades': 0, 'failed_trades': 0, 'total_profit': 0.0}
+trade_index_lock = threading.Lock()
+trade_index_generation = 0
+trade_history_cache = {}
+trade_history_cache_lock = threading.Lock()
+api_secrets = {'binance': b'', 'okx': b''}
+okx_timestamp_prefix = (0, '')
+price_cache = {'binance': (0.0, {}), 'okx': (0.0, {})}
+price_fetches = {}
+price_cache_lock = threading.Lock()
+stream_prices = {'binance': {}, 'okx': {}}
+okx_usdt_inst_ids = ()
+price_streams = {}
+price_stream_threads = {}
+price_stream_urls = {}
+price_stream_lock = threading.Lock()
 
 # Constants
 CONFIG_FILE = 'config.json'
 TRADE_LOG_FILE = 'trade_log.csv'
+REQUEST_TIMEOUT = (3, 10)  # (connect, read) seconds
+PRICE_CACHE_TTL = 1.5  # seconds
+MAX_JSON_BODY = 8192  # bytes
+TRADE_HISTORY_CACHE_TTL = 1.0  # seconds
+# Binance stream endpoints keyed by the REST host of the same environment
+BINANCE_STREAM_URLS = {
+    'api.binance.com': 'wss://stream.binance.com:9443/ws',
+    'api1.binance.com': 'wss://stream.binance.com:9443/ws',
+    'api2.binance.com': 'wss://stream.binance.com:9443/ws',
+    'api3.binance.com': 'wss://stream.binance.com:9443/ws',
+    'api4.binance.com': 'wss://stream.binance.com:9443/ws',
+    'api-gcp.binance.com': 'wss://stream.binance.com:9443/ws',
+    'data-api.binance.vision': 'wss://data-stream.binance.vision/ws',
+    'testnet.binance.vision': 'wss://testnet.binance.vision/ws',
+}
+OKX_SUBSCRIBE_BATCH = 100  # channels per subscribe request
+# OKX public stream endpoints keyed by okx.demo_trading
+OKX_STREAM_URLS = {
+    False: 'wss://ws.okx.com:8443/ws/v5/public',
+    True: 'wss://wspap.okx.com:8443/ws/v5/public',
+}
+HEALTH_BODY = b'{"status":"healthy"}'
+NOT_FOUND_BODY = orjson.dumps({
+    'error': 'Not Found',
+    'message': 'The requested URL was not found on the server.'
+})
+INTERNAL_ERROR_BODY = orjson.dumps({
+    'error': 'Internal Server Error',
+    'message': 'The server encountered an internal error and was unable to complete your request.'
+})
+# Trade amount tiers: < $0.5 -> 15 coins, $0.5-$1 -> 8, $1-$3.5 -> 4, > $3.5 -> 1
+# ($3.5 itself belongs to the 4-coin tier, hence the next float up as the last break)
+TRADE_AMOUNT_BREAKS = (0.5, 1.0, float(np.nextafter(3.5, np.inf)))
+TRADE_AMOUNTS = (15, 8, 4, 1)
+TRADE_LOG_FIELDS = (
+    'timestamp', 'coin', 'buy_exchange', 'buy_price',
+    'sell_exchange', 'sell_price', 'amount',
+    'gross_profit', 'fees', 'net_profit', 'status',
+    'buy_order_id', 'sell_order_id', 'error', 'trade_type'
+)
+get_trade_log_row = operator.itemgetter(*TRADE_LOG_FIELDS)
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -61,6 +168,25 @@ DEFAULT_CONFIG = {
     'use_websocket': False
 }
 
+# Settable configuration values: (key path, type, is secret)
+CONFIG_SCHEMA = tuple((tuple(path.split('.')), caster, secret) for path, caster, secret in (
+    ('binance.api_key', str, True),
+    ('binance.api_secret', str, True),
+    ('binance.taker_fee', float, False),
+    ('okx.api_key', str, True),
+    ('okx.api_secret', str, True),
+    ('okx.passphrase', str, True),
+    ('okx.taker_fee', float, False),
+    ('okx.demo_trading', bool, False),
+    ('min_profit_threshold', float, False),
+    ('max_concurrent_trades', int, False),
+    ('refresh_interval', int, False),
+    ('trade_cooldown', int, False),
+    ('auto_trade', bool, False),
+    ('use_websocket', bool, False),
+))
+SECRET_CONFIG_PATHS = tuple(path for path, _, secret in CONFIG_SCHEMA if secret)
+
 # Configure logging
 if not os.path.exists('logs'):
     os.makedirs('logs')
@@ -74,10 +200,52 @@ app.logger.addHandler(file_handler)
 app.logger.setLevel(logging.INFO)
 app.logger.info('Simplified Crypto Arbitrage Web Application startup')
 
+# HTTP sessions
+def create_session():
+    """Create a pooled keep-alive session for exchange API calls"""
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=20,
+        max_retries=Retry(total=2, backoff_factor=0.1)
+    ))
+    session.headers['Accept-Encoding'] = 'gzip'
+    return session
+
+BINANCE_SESSION = create_session()
+OKX_SESSION = create_session()
+
+# Executor for issuing exchange requests concurrently
+EXEC = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='exchange')
+
+# Bounded pool for processing trades
+TRADE_WORKERS = 8
+TRADE_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=TRADE_WORKERS, thread_name_prefix='trade')
+
+# Dedicated pool for order legs, one worker per leg of every trade in flight,
+# so neither leg waits behind price or balance fetches
+ORDER_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=TRADE_WORKERS * 2, thread_name_prefix='order')
+
 # Helper functions
+def configure_exchange_clients():
+    """Apply configuration-dependent headers and signing keys for the exchange clients"""
+    api_secrets['binance'] = config['binance']['api_secret'].encode('utf-8')
+    api_secrets['okx'] = config['okx']['api_secret'].encode('utf-8')
+    
+    if config['binance']['api_key']:
+        BINANCE_SESSION.headers['X-MBX-APIKEY'] = config['binance']['api_key']
+    else:
+        BINANCE_SESSION.headers.pop('X-MBX-APIKEY', None)
+    
+    if config['okx']['demo_trading']:
+        OKX_SESSION.headers['x-simulated-trading'] = '1'
+    else:
+        OKX_SESSION.headers.pop('x-simulated-trading', None)
+
 def load_config():
     """Load configuration from file or create default"""
-    global config
+    global config, safe_config_cache
+    safe_config_cache = None
     try:
         if os.path.exists(CONFIG_FILE):
             with open(CONFIG_FILE, 'r') as f:
@@ -86,101 +254,336 @@ def load_config():
             # Create default config file
             with open(CONFIG_FILE, 'w') as f:
                 json.dump(DEFAULT_CONFIG, f, indent=4)
-            config = DEFAULT_CONFIG
+            config = copy.deepcopy(DEFAULT_CONFIG)
+        configure_exchange_clients()
         return config
     except Exception as e:
         app.logger.error(f"Error loading config: {e}")
-        config = DEFAULT_CONFIG
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        configure_exchange_clients()
         return config
 
 def save_config(new_config):
-    """Save configuration to file"""
-    global config
+    """Apply a configuration and queue it to be written to file"""
+    global config, safe_config_cache
     try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(new_config, f, indent=4)
+        # Snapshot now; the writer thread only persists the latest of a burst
+        config_save_queue.put(json.dumps(new_config, indent=4))
         config = new_config
+        safe_config_cache = None
+        configure_exchange_clients()
         return True
     except Exception as e:
         app.logger.error(f"Error saving config: {e}")
         return False
 
+def config_writer():
+    """Background thread that writes queued configurations to file"""
+    while True:
+        pending = [config_save_queue.get()]
+        # Coalesce any saves queued meanwhile into a single write
+        try:
+            while True:
+                pending.append(config_save_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        snapshots = [p for p in pending if p is not None]
+        if snapshots:
+            try:
+                with open(CONFIG_FILE, 'w') as f:
+                    f.write(snapshots[-1])
+            except Exception as e:
+                app.logger.error(f"Error writing config: {e}")
+        
+        if None in pending:
+            break
+
+def start_config_writer():
+    """Start the config writer thread"""
+    global config_save_thread
+    
+    if config_save_thread is None or not config_save_thread.is_alive():
+        config_save_thread = threading.Thread(target=config_writer)
+        config_save_thread.daemon = True
+        config_save_thread.start()
+
+def stop_config_writer():
+    """Write any pending configuration and stop the writer thread"""
+    if config_save_thread is not None and config_save_thread.is_alive():
+        config_save_queue.put(None)
+        config_save_thread.join(timeout=5)
+
+def lookup_config_path(source, path):
+    """Get the dict holding the last key of path, or None if it doesn't exist"""
+    if not isinstance(source, dict):
+        return None
+    for key in path[:-1]:
+        source = source.get(key)
+        if not isinstance(source, dict):
+            return None
+    return source if path[-1] in source else None
+
+def apply_config_updates(data, target):
+    """Copy the schema values present in data into target, cast to their types"""
+    for path, caster, secret in CONFIG_SCHEMA:
+        source = lookup_config_path(data, path)
+        if source is not None:
+            value = source[path[-1]]
+            if value is None and secret:
+                # A cleared secret is stored empty so it still reads as unset
+                value = ''
+            # JSON numbers and booleans usually arrive with the right type already
+            elif type(value) is not caster:
+                value = caster(value)
+            reduce(operator.getitem, path[:-1], target)[path[-1]] = value
+
+def mask_config(source):
+    """Copy the configuration with secret values replaced by whether they are set"""
+    # Only the sections holding secrets are copied; the result is serialized right away
+    safe_config = dict(source)
+    copied = set()
+    for path in SECRET_CONFIG_PATHS:
+        parent = safe_config
+        for depth, key in enumerate(path[:-1], 1):
+            if not isinstance(parent.get(key), dict):
+                break
+            if path[:depth] not in copied:
+                parent[key] = dict(parent[key])
+                copied.add(path[:depth])
+            parent = parent[key]
+        else:
+            if path[-1] in parent:
+                parent[path[-1]] = bool(parent[path[-1]])
+    return safe_config
+
 def init_trade_log():
     """Initialize trade log file if it doesn't exist"""
     if not os.path.exists(TRADE_LOG_FILE):
         with open(TRADE_LOG_FILE, 'w', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow([
-                'timestamp', 'coin', 'buy_exchange', 'buy_price', 
-                'sell_exchange', 'sell_price', 'amount', 
-                'gross_profit', 'fees', 'net_profit', 'status',
-                'buy_order_id', 'sell_order_id', 'error', 'trade_type'
-            ])
+            writer.writerow(TRADE_LOG_FIELDS)
+
+def index_trade(trade):
+    """Add a trade log row to the in-memory index (caller holds trade_index_lock)"""
+    global trade_index_generation
+    trade_index_generation += 1
+    trade_index.append(trade)
+    trades_by_status[trade['status']].append(trade)
+    trades_by_coin[trade['coin']].append(trade)
+    trade_stats['total_trades'] += 1
+    if trade['status'] == 'Completed':
+        trade_stats['completed_trades'] += 1
+        trade_stats['total_profit'] += float(trade['net_profit'])
+    elif trade['status'] == 'Failed':
+        trade_stats['failed_trades'] += 1
+
+def load_trade_index():
+    """Load existing trade log rows into the in-memory index"""
+    try:
+        with open(TRADE_LOG_FILE, 'r', newline='') as f:
+            reader = csv.DictReader(f)
+            with trade_index_lock:
+                for row in reader:
+                    index_trade(row)
+    except Exception as e:
+        app.logger.error(f"Error loading trade log: {e}")
 
 def log_trade(trade_data):
-    """Log a trade to the CSV file"""
+    """Log a trade to the CSV file (trade_data must contain every TRADE_LOG_FIELDS key)"""
     try:
-        with open(TRADE_LOG_FILE, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                trade_data.get('timestamp', ''),
-                trade_data.get('coin', ''),
-                trade_data.get('buy_exchange', ''),
-                trade_data.get('buy_price', 0),
-                trade_data.get('sell_exchange', ''),
-                trade_data.get('sell_price', 0),
-                trade_data.get('amount', 0),
-                trade_data.get('gross_profit', 0),
-                trade_data.get('fees', 0),
-                trade_data.get('net_profit', 0),
-                trade_data.get('status', ''),
-                trade_data.get('buy_order_id', ''),
-                trade_data.get('sell_order_id', ''),
-                trade_data.get('error', ''),
-                trade_data.get('trade_type', 'Manual')
-            ])
+        # Snapshot the row now; the writer thread appends it to the file
+        row = get_trade_log_row(trade_data)
+        trade_log_queue.put(row)
+        
+        # Index the row as it will read back from the CSV file
+        with trade_index_lock:
+            index_trade(dict(zip(TRADE_LOG_FIELDS, ('' if v is None else str(v) for v in row))))
         return True
     except Exception as e:
         app.logger.error(f"Error logging trade: {e}")
         return False
 
-def get_binance_signature(query_string, secret):
+def trade_log_writer():
+    """Background thread that appends queued trade rows to the trade log"""
+    with open(TRADE_LOG_FILE, 'a', newline='', buffering=1 << 16) as f:
+        writer = csv.writer(f)
+        while True:
+            row = trade_log_queue.get()
+            if row is None:
+                break
+            try:
+                writer.writerow(row)
+                # Flush once the burst of queued rows has been written
+                if trade_log_queue.empty():
+                    f.flush()
+            except Exception as e:
+                app.logger.error(f"Error writing trade log: {e}")
+
+def start_trade_log_writer():
+    """Start the trade log writer thread"""
+    global trade_log_thread
+    
+    if trade_log_thread is None or not trade_log_thread.is_alive():
+        trade_log_thread = threading.Thread(target=trade_log_writer)
+        trade_log_thread.daemon = True
+        trade_log_thread.start()
+
+def stop_trade_log_writer():
+    """Flush pending trade rows and stop the writer thread"""
+    if trade_log_thread is not None and trade_log_thread.is_alive():
+        trade_log_queue.put(None)
+        trade_log_thread.join(timeout=5)
+
+def ojsonify(obj, status=200):
+    """Build a JSON response with a status through the app's orjson provider"""
+    response = app.json.response(obj)
+    response.status_code = status
+    return response
+
+def read_json(max_bytes=MAX_JSON_BODY):
+    """Parse a small JSON request body, rejecting oversized payloads before reading them"""
+    if not request.is_json:
+        abort(415)
+    if request.content_length is not None and request.content_length > max_bytes:
+        abort(413)
+    # Chunked bodies have no Content-Length, so read at most one byte past the limit
+    body = request.stream.read(max_bytes + 1)
+    if len(body) > max_bytes:
+        abort(413)
+    if not body:
+        return None
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        abort(400)
+
+def require_json(schema):
+    """Decorate a view to read its JSON body and pass the schema fields as typed kwargs"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper():
+            data = read_json()
+            try:
+                kwargs = {key: caster(data[key]) for key, caster in schema.items()}
+            except (KeyError, TypeError, ValueError):
+                return ojsonify({
+                    'success': False,
+                    'message': f"Missing required parameter: {', '.join(schema)}"
+                }, 400)
+            return view(**kwargs)
+        return wrapper
+    return decorator
+
+def content_etag(body):
+    """Compute an ETag for a response body"""
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+def etag_response(etag, build_response):
+    """Return 304 if the client already has etag, otherwise the built response"""
+    # Weak: the body carries a per-request timestamp, so it is only semantically equal
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = build_response()
+    response.set_etag(etag, weak=True)
+    return response
+
+def parse_json(response):
+    """Decode an exchange API response body"""
+    return orjson.loads(response.content)
+
+def get_binance_signature(query_string):
     """Generate Binance API signature"""
     return hmac.new(
-        secret.encode('utf-8'),
+        api_secrets['binance'],
         query_string.encode('utf-8'),
         hashlib.sha256
     ).hexdigest()
 
-def get_okx_signature(timestamp, method, request_path, body, secret):
+def get_okx_timestamp():
+    """Get the current UTC time in OKX's ISO 8601 millisecond format"""
+    global okx_timestamp_prefix
+    seconds, millis = divmod(time.time_ns() // 1_000_000, 1000)
+    
+    # Only reformat the date/time part when the second rolls over
+    cached_seconds, prefix = okx_timestamp_prefix
+    if seconds != cached_seconds:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))
+        okx_timestamp_prefix = (seconds, prefix)
+    
+    return f"{prefix}.{millis:03d}Z"
+
+def get_okx_signature(timestamp, method, request_path, body):
     """Generate OKX API signature"""
     if str(body) == '{}' or str(body) == 'None':
         body = ''
     message = timestamp + method + request_path + body
     mac = hmac.new(
-        bytes(secret, encoding='utf8'),
+        api_secrets['okx'],
         bytes(message, encoding='utf-8'),
         digestmod='sha256'
     )
     return base64.b64encode(mac.digest()).decode()
 
+def get_cached_prices(exchange, fetch):
+    """Get prices for an exchange from the short-lived cache, sharing one in-flight fetch"""
+    with price_cache_lock:
+        timestamp, prices = price_cache[exchange]
+        if time.time() - timestamp < PRICE_CACHE_TTL:
+            return prices
+        
+        inflight = price_fetches.get(exchange)
+        is_leader = inflight is None
+        if is_leader:
+            inflight = price_fetches[exchange] = (threading.Event(), [])
+    
+    event, result = inflight
+    
+    # Another thread is already fetching; wait for its result
+    if not is_leader:
+        event.wait()
+        return result[0] if result else {}
+    
+    try:
+        prices = fetch()
+        result.append(prices)
+        # Only cache successful fetches so errors are retried on the next call
+        if prices:
+            with price_cache_lock:
+                price_cache[exchange] = (time.time(), prices)
+        return prices
+    finally:
+        with price_cache_lock:
+            del price_fetches[exchange]
+        event.set()
+
 def get_binance_prices():
+    """Get prices from Binance (cached)"""
+    return get_cached_prices('binance', fetch_binance_prices)
+
+def get_okx_prices():
+    """Get prices from OKX (cached)"""
+    return get_cached_prices('okx', fetch_okx_prices)
+
+def get_all_prices():
+    """Get prices from both exchanges concurrently"""
+    binance_future = EXEC.submit(get_binance_prices)
+    okx_future = EXEC.submit(get_okx_prices)
+    return binance_future.result(), okx_future.result()
+
+def fetch_binance_prices():
     """Get prices from Binance API"""
     try:
-        response = requests.get(f"{config['binance']['base_url']}/v3/ticker/price")
+        response = BINANCE_SESSION.get(f"{config['binance']['base_url']}/v3/ticker/price", timeout=REQUEST_TIMEOUT)
         if response.status_code == 200:
-            all_prices = response.json()
-            # Filter for USDT pairs and convert to dictionary
-            prices = {}
-            for item in all_prices:
-                symbol = item['symbol']
-                if symbol.endswith('USDT'):
-                    coin = symbol[:-4]  # Remove USDT suffix
-                    price = float(item['price'])
-                    # Only include coins under $5
-                    if price < 5.0:
-                        prices[coin] = price
-            return prices
+            all_prices = parse_json(response)
+            # Keep USDT pairs under $5, keyed by coin (USDT suffix removed)
+            return {
+                item['symbol'][:-4]: price
+                for item in all_prices
+                if item['symbol'].endswith('USDT') and (price := float(item['price'])) < 5.0
+            }
         else:
             app.logger.error(f"Error getting Binance prices: {response.status_code} - {response.text}")
             return {}
@@ -188,32 +591,26 @@ def get_binance_prices():
         app.logger.error(f"Exception getting Binance prices: {e}")
         return {}
 
-def get_okx_prices():
+def fetch_okx_prices():
     """Get prices from OKX API"""
+    global okx_usdt_inst_ids
     try:
         url = f"{config['okx']['base_url']}/api/v5/market/tickers?instType=SPOT"
         
-        headers = {}
-        if config['okx']['demo_trading']:
-            headers['x-simulated-trading'] = '1'
-        
-        response = requests.get(url, headers=headers)
+        response = OKX_SESSION.get(url, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             if data['code'] == '0':
-                all_tickers = data['data']
-                # Filter for USDT pairs and convert to dictionary
-                prices = {}
-                for ticker in all_tickers:
-                    symbol = ticker['instId']
-                    if symbol.endswith('-USDT'):
-                        coin = symbol.split('-')[0]
-                        price = float(ticker['last'])
-                        # Only include coins under $5
-                        if price < 5.0:
-                            prices[coin] = price
-                return prices
+                tickers = [ticker for ticker in data['data'] if ticker['instId'].endswith('-USDT')]
+                # Remember every USDT pair so the stream also sees coins that later drop under $5
+                okx_usdt_inst_ids = tuple(ticker['instId'] for ticker in tickers)
+                # Keep USDT pairs under $5, keyed by coin (-USDT suffix removed)
+                return {
+                    ticker['instId'][:-5]: price
+                    for ticker in tickers
+                    if (price := float(ticker['last'])) < 5.0
+                }
             else:
                 app.logger.error(f"OKX API error: {data['msg']}")
                 return {}
@@ -226,23 +623,22 @@ def get_okx_prices():
 
 def get_binance_balances():
     """Get account balances from Binance API"""
-    if not config['binance']['api_key'] or not config['binance']['api_secret']:
+    binance_config = config['binance']
+    
+    if not binance_config['api_key'] or not binance_config['api_secret']:
         return []
     
     try:
         timestamp = int(time.time() * 1000)
         query_string = f"timestamp={timestamp}"
-        signature = get_binance_signature(query_string, config['binance']['api_secret'])
+        signature = get_binance_signature(query_string)
         
-        url = f"{config['binance']['base_url']}/v3/account?{query_string}&signature={signature}"
-        headers = {
-            'X-MBX-APIKEY': config['binance']['api_key']
-        }
+        url = f"{binance_config['base_url']}/v3/account?{query_string}&signature={signature}"
         
-        response = requests.get(url, headers=headers)
+        response = BINANCE_SESSION.get(url, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             # Filter for non-zero balances
             balances = [b for b in data['balances'] if float(b['free']) > 0 or float(b['locked']) > 0]
             return balances
@@ -255,33 +651,32 @@ def get_binance_balances():
 
 def get_okx_balances():
     """Get account balances from OKX API"""
-    if not config['okx']['api_key'] or not config['okx']['api_secret'] or not config['okx']['passphrase']:
+    okx_config = config['okx']
+    
+    if not okx_config['api_key'] or not okx_config['api_secret'] or not okx_config['passphrase']:
         return []
     
     try:
-        timestamp = datetime.datetime.utcnow().isoformat()[:-3] + 'Z'
+        timestamp = get_okx_timestamp()
         method = 'GET'
         request_path = '/api/v5/account/balance'
         body = ''
         
-        signature = get_okx_signature(timestamp, method, request_path, body, config['okx']['api_secret'])
+        signature = get_okx_signature(timestamp, method, request_path, body)
         
-        url = f"{config['okx']['base_url']}{request_path}"
+        url = f"{okx_config['base_url']}{request_path}"
         headers = {
-            'OK-ACCESS-KEY': config['okx']['api_key'],
+            'OK-ACCESS-KEY': okx_config['api_key'],
             'OK-ACCESS-SIGN': signature,
             'OK-ACCESS-TIMESTAMP': timestamp,
-            'OK-ACCESS-PASSPHRASE': config['okx']['passphrase'],
+            'OK-ACCESS-PASSPHRASE': okx_config['passphrase'],
             'Content-Type': 'application/json'
         }
         
-        if config['okx']['demo_trading']:
-            headers['x-simulated-trading'] = '1'
-        
-        response = requests.get(url, headers=headers)
+        response = OKX_SESSION.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             if data['code'] == '0':
                 # Extract balances from response
                 if data['data'] and len(data['data']) > 0:
@@ -301,80 +696,96 @@ def get_okx_balances():
         app.logger.error(f"Exception getting OKX balances: {e}")
         return []
 
+def get_all_balances():
+    """Get balances from both exchanges concurrently"""
+    binance_future = EXEC.submit(get_binance_balances)
+    okx_future = EXEC.submit(get_okx_balances)
+    return binance_future.result(), okx_future.result()
+
 def calculate_trade_amount(price):
     """Calculate trade amount based on price"""
-    if price > 3.5:
-        return 1
-    elif price >= 1:
-        return 4
-    elif price >= 0.5:
-        return 8
-    else:
-        return 15
+    return TRADE_AMOUNTS[bisect.bisect_right(TRADE_AMOUNT_BREAKS, price)]
 
 def calculate_opportunities(binance_prices, okx_prices):
     """Calculate arbitrage opportunities between exchanges"""
-    opportunities = []
+    binance_fee = config['binance']['taker_fee']
+    okx_fee = config['okx']['taker_fee']
+    min_profit_threshold = config['min_profit_threshold']
     
     # Find common coins
-    common_coins = set(binance_prices.keys()).intersection(set(okx_prices.keys()))
+    common_coins = binance_prices.keys() & okx_prices.keys()
     
-    for coin in common_coins:
-        binance_price = binance_prices[coin]
-        okx_price = okx_prices[coin]
-        
-        # Calculate price difference percentage
-        if binance_price < okx_price:
-            buy_exchange = 'Binance'
-            sell_exchange = 'OKX'
-            buy_price = binance_price
-            sell_price = okx_price
-        else:
-            buy_exchange = 'OKX'
-            sell_exchange = 'Binance'
-            buy_price = okx_price
-            sell_price = binance_price
-        
-        price_diff = sell_price - buy_price
-        price_diff_pct = (price_diff / buy_price) * 100
-        
-        # Calculate trade amount based on price
-        trade_amount = calculate_trade_amount(buy_price)
-        
-        # Calculate fees
-        binance_fee = config['binance']['taker_fee'] * (buy_price if buy_exchange == 'Binance' else sell_price) * trade_amount
-        okx_fee = config['okx']['taker_fee'] * (buy_price if buy_exchange == 'OKX' else sell_price) * trade_amount
-        total_fees = binance_fee + okx_fee
-        
-        # Calculate profit
-        gross_profit = price_diff * trade_amount
-        net_profit = gross_profit - total_fees
-        
-        # Check if trade is in cooldown
-        in_cooldown = coin in trade_cooldowns and trade_cooldowns[coin] > time.time()
-        
-        # Check if profitable
-        profitable = net_profit > config['min_profit_threshold']
-        
+    if not common_coins:
+        return []
+    
+    coins = list(common_coins)
+    binance = np.fromiter((binance_prices[coin] for coin in coins), dtype=np.float64, count=len(coins))
+    okx = np.fromiter((okx_prices[coin] for coin in coins), dtype=np.float64, count=len(coins))
+    
+    # Buy on the cheaper exchange, sell on the other one
+    binance_buy = binance < okx
+    buy_prices = np.where(binance_buy, binance, okx)
+    sell_prices = np.where(binance_buy, okx, binance)
+    
+    # Calculate price difference percentage
+    price_diff = sell_prices - buy_prices
+    price_diff_pct = (price_diff / buy_prices) * 100
+    
+    # Calculate trade amount based on price (see calculate_trade_amount)
+    trade_amounts = np.take(TRADE_AMOUNTS, np.searchsorted(TRADE_AMOUNT_BREAKS, buy_prices, side='right'))
+    
+    # Calculate fees (each exchange charges its taker fee on its own leg)
+    binance_fees = binance_fee * binance * trade_amounts
+    okx_fees = okx_fee * okx * trade_amounts
+    total_fees = binance_fees + okx_fees
+    
+    # Calculate profit
+    gross_profit = price_diff * trade_amounts
+    net_profit = gross_profit - total_fees
+    
+    # Check if profitable
+    profitable = net_profit > min_profit_threshold
+    
+    # Check if trade is in cooldown
+    now = time.time()
+    in_cooldown = np.fromiter(
+        (trade_cooldowns.get(coin, 0) > now for coin in coins), dtype=bool, count=len(coins)
+    )
+    
+    # Sort by net profit (descending) and build the result rows
+    order = np.argsort(-net_profit, kind='stable')
+    
+    opportunities = []
+    for coin_index, is_binance_buy, buy_price, sell_price, diff, diff_pct, amount, gross, fees, net, is_profitable, is_cooling_down in zip(
+        order.tolist(),
+        binance_buy[order].tolist(),
+        buy_prices[order].tolist(),
+        sell_prices[order].tolist(),
+        price_diff[order].tolist(),
+        price_diff_pct[order].tolist(),
+        trade_amounts[order].tolist(),
+        gross_profit[order].tolist(),
+        total_fees[order].tolist(),
+        net_profit[order].tolist(),
+        profitable[order].tolist(),
+        in_cooldown[order].tolist()
+    ):
         opportunities.append({
-            'coin': coin,
-            'buy_exchange': buy_exchange,
+            'coin': coins[coin_index],
+            'buy_exchange': 'Binance' if is_binance_buy else 'OKX',
             'buy_price': buy_price,
-            'sell_exchange': sell_exchange,
+            'sell_exchange': 'OKX' if is_binance_buy else 'Binance',
             'sell_price': sell_price,
-            'price_diff': price_diff,
-            'price_diff_pct': price_diff_pct,
-            'trade_amount': trade_amount,
-            'gross_profit': gross_profit,
-            'fees': total_fees,
-            'net_profit': net_profit,
-            'profitable': profitable,
-            'in_cooldown': in_cooldown
+            'price_diff': diff,
+            'price_diff_pct': diff_pct,
+            'trade_amount': amount,
+            'gross_profit': gross,
+            'fees': fees,
+            'net_profit': net,
+            'profitable': is_profitable,
+            'in_cooldown': is_cooling_down
         })
     
-    # Sort by net profit (descending)
-    opportunities.sort(key=lambda x: x['net_profit'], reverse=True)
-    
     return opportunities
 
 def place_binance_order(coin, side, quantity):
@@ -391,18 +802,15 @@ def place_binance_order(coin, side, quantity):
             'timestamp': timestamp
         }
         
-        query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
-        signature = get_binance_signature(query_string, config['binance']['api_secret'])
+        query_string = urlencode(params)
+        signature = get_binance_signature(query_string)
         
         url = f"{config['binance']['base_url']}/v3/order?{query_string}&signature={signature}"
-        headers = {
-            'X-MBX-APIKEY': config['binance']['api_key']
-        }
         
-        response = requests.post(url, headers=headers)
+        response = BINANCE_SESSION.post(url, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            return response.json()
+            return parse_json(response)
         else:
             app.logger.error(f"Error placing Binance order: {response.status_code} - {response.text}")
             return {'error': response.text}
@@ -412,8 +820,10 @@ def place_binance_order(coin, side, quantity):
 
 def place_okx_order(coin, side, quantity):
     """Place an order on OKX"""
+    okx_config = config['okx']
+    
     try:
-        timestamp = datetime.datetime.utcnow().isoformat()[:-3] + 'Z'
+        timestamp = get_okx_timestamp()
         method = 'POST'
         request_path = '/api/v5/trade/order'
         
@@ -428,25 +838,24 @@ def place_okx_order(coin, side, quantity):
             'sz': str(quantity)
         }
         
-        body_str = json.dumps(body)
-        signature = get_okx_signature(timestamp, method, request_path, body_str, config['okx']['api_secret'])
+        # Serialize once so the signed string and the sent body are identical
+        body_bytes = orjson.dumps(body)
+        body_str = body_bytes.decode()
+        signature = get_okx_signature(timestamp, method, request_path, body_str)
         
-        url = f"{config['okx']['base_url']}{request_path}"
+        url = f"{okx_config['base_url']}{request_path}"
         headers = {
-            'OK-ACCESS-KEY': config['okx']['api_key'],
+            'OK-ACCESS-KEY': okx_config['api_key'],
             'OK-ACCESS-SIGN': signature,
             'OK-ACCESS-TIMESTAMP': timestamp,
-            'OK-ACCESS-PASSPHRASE': config['okx']['passphrase'],
+            'OK-ACCESS-PASSPHRASE': okx_config['passphrase'],
             'Content-Type': 'application/json'
         }
         
-        if config['okx']['demo_trading']:
-            headers['x-simulated-trading'] = '1'
-        
-        response = requests.post(url, headers=headers, json=body)
+        response = OKX_SESSION.post(url, headers=headers, data=body_bytes, timeout=REQUEST_TIMEOUT)
         
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             if data['code'] == '0':
                 return data['data'][0]
             else:
@@ -459,11 +868,46 @@ def place_okx_order(coin, side, quantity):
         app.logger.error(f"Exception placing OKX order: {e}")
         return {'error': str(e)}
 
+@contextlib.contextmanager
+def gc_paused():
+    """Suspend automatic garbage collection while any trade is placing orders"""
+    global gc_pause_count
+    with gc_pause_lock:
+        if gc_pause_count == 0:
+            gc.disable()
+        gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with gc_pause_lock:
+            gc_pause_count -= 1
+            if gc_pause_count == 0:
+                gc.enable()
+
+def place_order(exchange, coin, side, quantity):
+    """Place an order on the given exchange"""
+    if exchange == 'Binance':
+        return place_binance_order(coin, side, quantity)
+    else:  # OKX
+        return place_okx_order(coin, side, quantity)
+
+def add_trade_cooldown(coin, expires_at):
+    """Put a coin in cooldown and prune expired cooldowns"""
+    with cooldown_lock:
+        trade_cooldowns[coin] = expires_at
+        heapq.heappush(cooldown_heap, (expires_at, coin))
+        
+        now = time.time()
+        while cooldown_heap and cooldown_heap[0][0] <= now:
+            expired_at, expired_coin = heapq.heappop(cooldown_heap)
+            # Skip entries superseded by a later cooldown for the same coin
+            if trade_cooldowns.get(expired_coin) == expired_at:
+                del trade_cooldowns[expired_coin]
+
 def execute_trade(coin, trade_type='Manual'):
     """Execute a trade for a specific coin"""
     # Get current prices
-    binance_prices = get_binance_prices()
-    okx_prices = get_okx_prices()
+    binance_prices, okx_prices = get_all_prices()
     
     if coin not in binance_prices or coin not in okx_prices:
         return {
@@ -490,8 +934,8 @@ def execute_trade(coin, trade_type='Manual'):
     trade_amount = calculate_trade_amount(buy_price)
     
     # Calculate fees and profit
-    binance_fee = config['binance']['taker_fee'] * (buy_price if buy_exchange == 'Binance' else sell_price) * trade_amount
-    okx_fee = config['okx']['taker_fee'] * (buy_price if buy_exchange == 'OKX' else sell_price) * trade_amount
+    binance_fee = config['binance']['taker_fee'] * binance_price * trade_amount
+    okx_fee = config['okx']['taker_fee'] * okx_price * trade_amount
     total_fees = binance_fee + okx_fee
     
     gross_profit = (sell_price - buy_price) * trade_amount
@@ -525,12 +969,10 @@ def execute_trade(coin, trade_type='Manual'):
     active_trades[trade_id] = trade_data
     
     # Add to cooldown
-    trade_cooldowns[coin] = time.time() + config['trade_cooldown']
+    add_trade_cooldown(coin, time.time() + config['trade_cooldown'])
     
-    # Start trade execution in a separate thread
-    thread = threading.Thread(target=process_trade, args=(trade_id, trade_data))
-    thread.daemon = True
-    thread.start()
+    # Process the trade on the trade pool
+    TRADE_POOL.submit(process_trade, trade_id, trade_data)
     
     return {
         'success': True,
@@ -539,7 +981,7 @@ def execute_trade(coin, trade_type='Manual'):
     }
 
 def process_trade(trade_id, trade_data):
-    """Process a trade in a separate thread"""
+    """Process a trade on the trade pool"""
     try:
         coin = trade_data['coin']
         buy_exchange = trade_data['buy_exchange']
@@ -549,43 +991,40 @@ def process_trade(trade_id, trade_data):
         app.logger.info(f"Processing trade {trade_id}: Buy {trade_amount} {coin} on {buy_exchange}, Sell on {sell_exchange}")
         
         # Update trade status
-        trade_data['status'] = f"Placing buy order on {buy_exchange}"
+        trade_data['status'] = f"Placing buy order on {buy_exchange} and sell order on {sell_exchange}"
         log_trade(trade_data)
         
-        # Place buy order
-        if buy_exchange == 'Binance':
-            buy_result = place_binance_order(coin, 'BUY', trade_amount)
-        else:  # OKX
-            buy_result = place_okx_order(coin, 'BUY', trade_amount)
+        # Place both legs concurrently so prices have less time to move between them
+        with gc_paused():
+            buy_future = ORDER_POOL.submit(place_order, buy_exchange, coin, 'BUY', trade_amount)
+            sell_future = ORDER_POOL.submit(place_order, sell_exchange, coin, 'SELL', trade_amount)
+            buy_result = buy_future.result()
+            sell_result = sell_future.result()
         
+        errors = []
         if 'error' in buy_result:
-            # Buy order failed
-            trade_data['status'] = 'Failed'
-            trade_data['error'] = f"Buy order failed: {buy_result['error']}"
-            log_trade(trade_data)
-            
-            # Remove from active trades
-            if trade_id in active_trades:
-                del active_trades[trade_id]
-            
-            app.logger.error(f"Trade {trade_id} failed: {trade_data['error']}")
-            return
-        
-        # Buy order succeeded
-        trade_data['buy_order_id'] = buy_result.get('ordId', buy_result.get('orderId', 'unknown'))
-        trade_data['status'] = f"Placing sell order on {sell_exchange}"
-        log_trade(trade_data)
-        
-        # Place sell order
-        if sell_exchange == 'Binance':
-            sell_result = place_binance_order(coin, 'SELL', trade_amount)
-        else:  # OKX
-            sell_result = place_okx_order(coin, 'SELL', trade_amount)
+            errors.append(f"Buy order failed: {buy_result['error']}")
+        else:
+            trade_data['buy_order_id'] = buy_result.get('ordId', buy_result.get('orderId', 'unknown'))
         
         if 'error' in sell_result:
-            # Sell order failed
+            errors.append(f"Sell order failed: {sell_result['error']}")
+        else:
+            trade_data['sell_order_id'] = sell_result.get('ordId', sell_result.get('orderId', 'unknown'))
+        
+        if errors:
+            # One or both orders failed
+            if len(errors) == 1:
+                # The legs run concurrently, so the other one may have filled on its own
+                if 'error' in buy_result:
+                    filled = f"sell order {trade_data['sell_order_id']} on {sell_exchange}"
+                else:
+                    filled = f"buy order {trade_data['buy_order_id']} on {buy_exchange}"
+                errors.append(f"Unhedged {filled} needs manual attention")
+                app.logger.critical(f"Trade {trade_id} filled only one leg: {filled} for {trade_amount} {coin}")
+            
             trade_data['status'] = 'Failed'
-            trade_data['error'] = f"Sell order failed: {sell_result['error']}"
+            trade_data['error'] = '; '.join(errors)
             log_trade(trade_data)
             
             # Remove from active trades
@@ -595,8 +1034,7 @@ def process_trade(trade_id, trade_data):
             app.logger.error(f"Trade {trade_id} failed: {trade_data['error']}")
             return
         
-        # Sell order succeeded
-        trade_data['sell_order_id'] = sell_result.get('ordId', sell_result.get('orderId', 'unknown'))
+        # Both orders succeeded
         trade_data['status'] = 'Completed'
         log_trade(trade_data)
         
@@ -621,22 +1059,21 @@ def process_trade(trade_id, trade_data):
 def get_trade_history(limit=None, status=None, coin=None):
     """Get trade history with optional filtering"""
     try:
-        if not os.path.exists(TRADE_LOG_FILE):
-            return []
-        
-        # Read CSV file
-        trades = []
-        with open(TRADE_LOG_FILE, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                trades.append(row)
-        
-        # Apply filters
-        if status:
-            trades = [t for t in trades if t['status'] == status]
-        
-        if coin:
-            trades = [t for t in trades if t['coin'] == coin]
+        # Start from the smallest matching bucket of the index
+        with trade_index_lock:
+            if status and coin:
+                by_status = trades_by_status.get(status, [])
+                by_coin = trades_by_coin.get(coin, [])
+                if len(by_status) <= len(by_coin):
+                    trades = [t for t in by_status if t['coin'] == coin]
+                else:
+                    trades = [t for t in by_coin if t['status'] == status]
+            elif status:
+                trades = list(trades_by_status.get(status, []))
+            elif coin:
+                trades = list(trades_by_coin.get(coin, []))
+            else:
+                trades = list(trade_index)
         
         # Sort by timestamp (descending)
         trades.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -653,56 +1090,157 @@ def get_trade_history(limit=None, status=None, coin=None):
 
 def get_trade_statistics():
     """Calculate trade statistics"""
-    try:
-        if not os.path.exists(TRADE_LOG_FILE):
-            return {
-                'total_trades': 0,
-                'completed_trades': 0,
-                'failed_trades': 0,
-                'total_profit': 0,
-                'avg_profit': 0
-            }
-        
-        # Read CSV file
-        trades = []
-        with open(TRADE_LOG_FILE, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                trades.append(row)
-        
-        if not trades:
-            return {
-                'total_trades': 0,
-                'completed_trades': 0,
-                'failed_trades': 0,
-                'total_profit': 0,
-                'avg_profit': 0
-            }
-        
-        # Calculate statistics
-        total_trades = len(trades)
-        completed_trades = len([t for t in trades if t['status'] == 'Completed'])
-        failed_trades = len([t for t in trades if t['status'] == 'Failed'])
+    with trade_index_lock:
+        total_trades = trade_stats['total_trades']
+        completed_trades = trade_stats['completed_trades']
+        failed_trades = trade_stats['failed_trades']
+        total_profit = trade_stats['total_profit'] if completed_trades > 0 else 0
+    
+    avg_profit = total_profit / completed_trades if completed_trades > 0 else 0
+    
+    return {
+        'total_trades': total_trades,
+        'completed_trades': completed_trades,
+        'failed_trades': failed_trades,
+        'total_profit': total_profit,
+        'avg_profit': avg_profit
+    }
+
+def publish_stream_prices(exchange):
+    """Publish the current stream snapshot to the price cache"""
+    prices = dict(stream_prices[exchange])
+    if prices:
+        with price_cache_lock:
+            price_cache[exchange] = (time.time(), prices)
+
+def handle_binance_stream_message(message):
+    """Apply a Binance all-market mini-ticker update"""
+    prices = stream_prices['binance']
+    for ticker in orjson.loads(message):
+        symbol = ticker['s']
+        if symbol.endswith('USDT'):
+            price = float(ticker['c'])
+            # Only include coins under $5
+            if price < 5.0:
+                prices[symbol[:-4]] = price
+            else:
+                prices.pop(symbol[:-4], None)
+    publish_stream_prices('binance')
+
+def subscribe_okx_stream(ws):
+    """Subscribe to OKX tickers for every USDT spot pair; the handler applies the price filter"""
+    args = [{'channel': 'tickers', 'instId': inst_id} for inst_id in okx_usdt_inst_ids]
+    # Split the subscription to keep each request well under OKX's message size limit
+    for start in range(0, len(args), OKX_SUBSCRIBE_BATCH):
+        ws.send(orjson.dumps({'op': 'subscribe', 'args': args[start:start + OKX_SUBSCRIBE_BATCH]}).decode())
+
+def handle_okx_stream_message(message):
+    """Apply an OKX tickers channel update"""
+    data = orjson.loads(message)
+    if data.get('event') == 'error':
+        app.logger.error(f"OKX stream error: {data.get('msg')}")
+        return
+    if 'data' not in data:
+        return
+    
+    prices = stream_prices['okx']
+    for ticker in data['data']:
+        price = float(ticker['last'])
+        # Only include coins under $5
+        if price < 5.0:
+            prices[ticker['instId'][:-5]] = price
+        else:
+            prices.pop(ticker['instId'][:-5], None)
+    publish_stream_prices('okx')
+
+def run_price_stream(exchange, fetch, handle_message, subscribe=None):
+    """Stream prices for an exchange, reconnecting until WebSocket updates are disabled"""
+    def on_open(ws):
+        # The environment may have changed while connecting; start_price_streams
+        # can't close a socket that wasn't registered yet, so drop it here
+        if price_stream_urls.get(exchange) != ws.url:
+            ws.close()
+        elif subscribe is not None:
+            subscribe(ws)
+    
+    def on_message(ws, message):
+        try:
+            handle_message(message)
+        except Exception as e:
+            app.logger.error(f"Error handling {exchange} stream message: {e}")
+    
+    def on_error(ws, error):
+        app.logger.error(f"{exchange} stream error: {error}")
+    
+    while not stop_threads and config['use_websocket']:
+        # The endpoint is re-read on every reconnect so environment changes take effect
+        url = price_stream_urls.get(exchange)
+        if url is None:
+            return
         
-        # Filter for completed trades for profit calculations
-        completed_trades_list = [t for t in trades if t['status'] == 'Completed']
+        # Seed from a REST snapshot; the stream keeps it current afterwards
+        prices = dict(fetch())
+        with price_stream_lock:
+            # Start over if the environment changed during the (possibly slow) fetch
+            if price_stream_urls.get(exchange) != url:
+                continue
+            stream_prices[exchange] = prices
+            publish_stream_prices(exchange)
+            ws = websocket.WebSocketApp(url, on_open=on_open, on_message=on_message, on_error=on_error)
+            price_streams[exchange] = ws
         
-        total_profit = sum(float(t['net_profit']) for t in completed_trades_list) if completed_trades_list else 0
-        avg_profit = total_profit / completed_trades if completed_trades > 0 else 0
+        ws.run_forever(ping_interval=20, ping_timeout=10)
+        with price_stream_lock:
+            if price_streams.get(exchange) is ws:
+                del price_streams[exchange]
         
-        return {
-            'total_trades': total_trades,
-            'completed_trades': completed_trades,
-            'failed_trades': failed_trades,
-            'total_profit': total_profit,
-            'avg_profit': avg_profit
-        }
+        if not stop_threads and config['use_websocket']:
+            time.sleep(5)
+
+def binance_stream_url():
+    """Binance mini-ticker stream endpoint matching base_url, or None for an unknown host"""
+    url = BINANCE_STREAM_URLS.get(urlsplit(config['binance']['base_url']).hostname)
+    return f"{url}/!miniTicker@arr" if url else None
+
+def okx_stream_url():
+    """OKX public stream endpoint for the configured trading environment"""
+    return OKX_STREAM_URLS[bool(config['okx']['demo_trading'])]
+
+PRICE_STREAMS = (
+    ('binance', binance_stream_url, fetch_binance_prices, handle_binance_stream_message, None),
+    ('okx', okx_stream_url, fetch_okx_prices, handle_okx_stream_message, subscribe_okx_stream),
+)
+
+def start_price_streams():
+    """Start the exchange price stream threads, reconnecting any whose environment changed"""
+    with price_stream_lock:
+        for exchange, stream_url, fetch, handle_message, subscribe in PRICE_STREAMS:
+            url = stream_url()
+            if url != price_stream_urls.get(exchange):
+                price_stream_urls[exchange] = url
+                # Drop prices streamed from the previous environment
+                ws = price_streams.get(exchange)
+                if ws is not None:
+                    ws.close()
+                stream_prices[exchange] = {}
+                with price_cache_lock:
+                    price_cache[exchange] = (0.0, {})
+                if url is None:
+                    app.logger.warning(f"No {exchange} stream matches the configured environment; using REST prices")
+            if url is None:
+                continue
             
-    except Exception as e:
-        app.logger.error(f"Error calculating trade statistics: {e}")
-        return {
-            'error': str(e)
-        }
+            thread = price_stream_threads.get(exchange)
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=run_price_stream, args=(exchange, fetch, handle_message, subscribe))
+                thread.daemon = True
+                thread.start()
+                price_stream_threads[exchange] = thread
+
+def stop_price_streams():
+    """Close any open exchange price streams"""
+    for ws in list(price_streams.values()):
+        ws.close()
 
 def background_price_updates():
     """Background thread for price updates"""
@@ -712,15 +1250,12 @@ def background_price_updates():
         try:
             # Check if websocket is enabled
             if not config['use_websocket']:
+                stop_price_streams()
                 time.sleep(5)
                 continue
             
-            # Get prices from both exchanges
-            binance_prices = get_binance_prices()
-            okx_prices = get_okx_prices()
-            
-            # Calculate opportunities
-            opportunities = calculate_opportunities(binance_prices, okx_prices)
+            # Keep the exchange streams feeding the price cache
+            start_price_streams()
             
             # Sleep for refresh interval
             time.sleep(config['refresh_interval'])
@@ -740,8 +1275,7 @@ def background_balance_updates():
                 continue
             
             # Get balances from both exchanges
-            get_binance_balances()
-            get_okx_balances()
+            get_all_balances()
             
             # Sleep for 30 seconds (balance updates less frequent than price updates)
             time.sleep(30)
@@ -768,8 +1302,7 @@ def auto_trade_monitor():
                 continue
             
             # Get current prices
-            binance_prices = get_binance_prices()
-            okx_prices = get_okx_prices()
+            binance_prices, okx_prices = get_all_prices()
             
             # Calculate opportunities
             opportunities = calculate_opportunities(binance_prices, okx_prices)
@@ -819,289 +1352,240 @@ def start_background_threads():
 def stop_background_threads():
     """Stop background threads"""
     global stop_threads
+    app.logger.info("Shutting down background threads")
     stop_threads = True
+    stop_price_streams()
 
 # Initialize configuration
 load_config()
+start_config_writer()
+atexit.register(stop_config_writer)
 init_trade_log()
+load_trade_index()
+start_trade_log_writer()
+atexit.register(stop_trade_log_writer)
+
+# Start background threads when the app starts and stop them at exit
+app.logger.info("Starting background threads")
+start_background_threads()
+atexit.register(stop_background_threads)
+
+# Move long-lived startup objects out of the collector's generations
+gc.freeze()
 
 # API routes
-@app.route('/api/prices', methods=['GET'])
+api = Blueprint('api', __name__, url_prefix='/api')
+
+@api.route('/prices', methods=['GET'])
 def api_prices():
     """Get prices from both exchanges"""
-    binance_prices = get_binance_prices()
-    okx_prices = get_okx_prices()
+    binance_prices, okx_prices = get_all_prices()
     
-    return jsonify({
+    return ojsonify({
         'binance_prices': binance_prices,
         'okx_prices': okx_prices,
-        'timestamp': datetime.datetime.now().isoformat()
+        'timestamp': datetime.datetime.now()
     })
 
-@app.route('/api/balances', methods=['GET'])
+@api.route('/balances', methods=['GET'])
 def api_balances():
     """Get balances from both exchanges"""
-    binance_balances = get_binance_balances()
-    okx_balances = get_okx_balances()
+    binance_balances, okx_balances = get_all_balances()
     
-    return jsonify({
+    return ojsonify({
         'binance_balances': binance_balances,
         'okx_balances': okx_balances,
-        'timestamp': datetime.datetime.now().isoformat()
+        'timestamp': datetime.datetime.now()
     })
 
-@app.route('/api/opportunities', methods=['GET'])
+@api.route('/opportunities', methods=['GET'])
 def api_opportunities():
     """Get arbitrage opportunities"""
-    binance_prices = get_binance_prices()
-    okx_prices = get_okx_prices()
+    binance_prices, okx_prices = get_all_prices()
     
     opportunities = calculate_opportunities(binance_prices, okx_prices)
     
-    return jsonify({
+    return ojsonify({
         'opportunities': opportunities,
-        'timestamp': datetime.datetime.now().isoformat()
+        'timestamp': datetime.datetime.now()
     })
 
-@app.route('/api/trade', methods=['POST'])
+@api.route('/trade', methods=['POST'])
 def api_trade():
     """Execute a trade"""
-    data = request.json
+    data = read_json()
     
     if not data or 'coin' not in data:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'message': 'Missing required parameter: coin'
-        }), 400
+        }, 400)
     
     result = execute_trade(data['coin'])
     
-    return jsonify(result)
+    return ojsonify(result)
 
-@app.route('/api/trade_history', methods=['GET'])
+@api.route('/trade_history', methods=['GET'])
 def api_trade_history():
     """Get trade history"""
     limit = request.args.get('limit', type=int)
     status = request.args.get('status')
     coin = request.args.get('coin')
     
-    trades = get_trade_history(limit, status, coin)
+    # Reuse the serialized trades for identical queries until the TTL ends or a trade is logged
+    key = (limit, status, coin, trade_index_generation)
+    now = time.time()
+    cached = trade_history_cache.get(key)
+    if cached is not None and cached[0] > now:
+        body = cached[1]
+    else:
+        body = b'{"trades":' + app.json.dumps_bytes(get_trade_history(limit, status, coin))
+        with trade_history_cache_lock:
+            # Drop expired entries so arbitrary query combinations don't accumulate
+            for expired_key in [k for k, (expires_at, _) in trade_history_cache.items() if expires_at <= now]:
+                del trade_history_cache[expired_key]
+            trade_history_cache[key] = (now + TRADE_HISTORY_CACHE_TTL, body)
     
-    return jsonify({
-        'trades': trades,
-        'timestamp': datetime.datetime.now().isoformat()
-    })
+    return app.response_class(
+        body + b',"timestamp":' + app.json.dumps_bytes(datetime.datetime.now()) + b'}',
+        mimetype='application/json'
+    )
 
-@app.route('/api/trade_statistics', methods=['GET'])
+@api.route('/trade_statistics', methods=['GET'])
 def api_trade_statistics():
     """Get trade statistics"""
     statistics = get_trade_statistics()
     
-    return jsonify({
+    return etag_response(content_etag(app.json.dumps_bytes(statistics)), lambda: ojsonify({
         'statistics': statistics,
-        'timestamp': datetime.datetime.now().isoformat()
-    })
+        'timestamp': datetime.datetime.now()
+    }))
 
-@app.route('/api/config', methods=['GET'])
+@api.route('/config', methods=['GET'])
 def api_get_config():
     """Get configuration"""
-    # Remove sensitive information
-    safe_config = dict(config)
-    if 'binance' in safe_config:
-        if 'api_key' in safe_config['binance']:
-            safe_config['binance']['api_key'] = bool(safe_config['binance']['api_key'])
-        if 'api_secret' in safe_config['binance']:
-            safe_config['binance']['api_secret'] = bool(safe_config['binance']['api_secret'])
-    
-    if 'okx' in safe_config:
-        if 'api_key' in safe_config['okx']:
-            safe_config['okx']['api_key'] = bool(safe_config['okx']['api_key'])
-        if 'api_secret' in safe_config['okx']:
-            safe_config['okx']['api_secret'] = bool(safe_config['okx']['api_secret'])
-        if 'passphrase' in safe_config['okx']:
-            safe_config['okx']['passphrase'] = bool(safe_config['okx']['passphrase'])
-    
-    return jsonify({
-        'config': safe_config,
-        'timestamp': datetime.datetime.now().isoformat()
-    })
+    global safe_config_cache
+    
+    # Remove sensitive information (cached until the configuration is saved again)
+    cached = safe_config_cache
+    if cached is None:
+        with config_lock:
+            body = b'{"config":' + app.json.dumps_bytes(mask_config(config))
+            cached = safe_config_cache = (body, content_etag(body))
+    
+    body, etag = cached
+    return etag_response(etag, lambda: app.response_class(
+        body + b',"timestamp":' + app.json.dumps_bytes(datetime.datetime.now()) + b'}',
+        mimetype='application/json'
+    ))
 
-@app.route('/api/config', methods=['POST'])
+@api.route('/config', methods=['POST'])
 def api_set_config():
     """Set configuration"""
-    data = request.json
+    data = read_json()
     
     if not data:
-        return jsonify({
+        return ojsonify({
             'success': False,
             'message': 'Missing configuration data'
-        }), 400
-    
-    # Update configuration
-    new_config = dict(config)
-    
-    # Update Binance configuration
-    if 'binance' in data:
-        if 'api_key' in data['binance']:
-            new_config['binance']['api_key'] = data['binance']['api_key']
-        if 'api_secret' in data['binance']:
-            new_config['binance']['api_secret'] = data['binance']['api_secret']
-        if 'taker_fee' in data['binance']:
-            new_config['binance']['taker_fee'] = float(data['binance']['taker_fee'])
-    
-    # Update OKX configuration
-    if 'okx' in data:
-        if 'api_key' in data['okx']:
-            new_config['okx']['api_key'] = data['okx']['api_key']
-        if 'api_secret' in data['okx']:
-            new_config['okx']['api_secret'] = data['okx']['api_secret']
-        if 'passphrase' in data['okx']:
-            new_config['okx']['passphrase'] = data['okx']['passphrase']
-        if 'taker_fee' in data['okx']:
-            new_config['okx']['taker_fee'] = float(data['okx']['taker_fee'])
-        if 'demo_trading' in data['okx']:
-            new_config['okx']['demo_trading'] = bool(data['okx']['demo_trading'])
-    
-    # Update general configuration
-    if 'min_profit_threshold' in data:
-        new_config['min_profit_threshold'] = float(data['min_profit_threshold'])
-    if 'max_concurrent_trades' in data:
-        new_config['max_concurrent_trades'] = int(data['max_concurrent_trades'])
-    if 'refresh_interval' in data:
-        new_config['refresh_interval'] = int(data['refresh_interval'])
-    if 'trade_cooldown' in data:
-        new_config['trade_cooldown'] = int(data['trade_cooldown'])
-    if 'auto_trade' in data:
-        new_config['auto_trade'] = bool(data['auto_trade'])
-    if 'use_websocket' in data:
-        new_config['use_websocket'] = bool(data['use_websocket'])
-    
-    # Save configuration
-    success = save_config(new_config)
-    
-    return jsonify({
+        }, 400)
+    
+    # Build the new configuration on a copy so a bad value leaves the live one untouched
+    with config_lock:
+        new_config = copy.deepcopy(config)
+        apply_config_updates(data, new_config)
+        
+        # Save configuration
+        success = save_config(new_config)
+    
+    # Switch streams to the new environment before they publish more prices
+    if success and config['use_websocket']:
+        start_price_streams()
+    
+    return ojsonify({
         'success': success,
         'message': 'Configuration updated' if success else 'Failed to update configuration'
     })
 
-@app.route('/api/auto_trade', methods=['POST'])
-def api_auto_trade():
+@api.route('/auto_trade', methods=['POST'])
+@require_json({'enabled': bool})
+def api_auto_trade(enabled):
     """Enable or disable auto-trading"""
-    data = request.json
+    # Update and save configuration
+    with config_lock:
+        config['auto_trade'] = enabled
+        success = save_config(config)
     
-    if not data or 'enabled' not in data:
-        return jsonify({
-            'success': False,
-            'message': 'Missing required parameter: enabled'
-        }), 400
-    
-    # Update configuration
-    new_config = dict(config)
-    new_config['auto_trade'] = bool(data['enabled'])
-    
-    # Save configuration
-    success = save_config(new_config)
-    
-    return jsonify({
+    return ojsonify({
         'success': success,
-        'auto_trade': new_config['auto_trade'],
-        'message': f"Auto-trading {'enabled' if new_config['auto_trade'] else 'disabled'}"
+        'auto_trade': enabled,
+        'message': f"Auto-trading {'enabled' if enabled else 'disabled'}"
     })
 
-@app.route('/api/websocket', methods=['POST'])
-def api_websocket():
+@api.route('/websocket', methods=['POST'])
+@require_json({'enabled': bool})
+def api_websocket(enabled):
     """Enable or disable WebSocket updates"""
-    data = request.json
-    
-    if not data or 'enabled' not in data:
-        return jsonify({
-            'success': False,
-            'message': 'Missing required parameter: enabled'
-        }), 400
-    
-    # Update configuration
-    new_config = dict(config)
-    new_config['use_websocket'] = bool(data['enabled'])
+    # Update and save configuration
+    with config_lock:
+        config['use_websocket'] = enabled
+        success = save_config(config)
     
-    # Save configuration
-    success = save_config(new_config)
-    
-    return jsonify({
+    return ojsonify({
         'success': success,
-        'use_websocket': new_config['use_websocket'],
-        'message': f"WebSocket {'enabled' if new_config['use_websocket'] else 'disabled'}"
+        'use_websocket': enabled,
+        'message': f"WebSocket {'enabled' if enabled else 'disabled'}"
     })
 
-@app.route('/api/export_trades', methods=['GET'])
+@api.route('/export_trades', methods=['GET'])
 def api_export_trades():
     """Export trade history as CSV"""
     if not os.path.exists(TRADE_LOG_FILE):
-        return jsonify({
+        return ojsonify({
             'success': False,
             'message': 'No trade history available'
-        }), 404
-    
-    # Create in-memory CSV
-    output = StringIO()
-    with open(TRADE_LOG_FILE, 'r') as f:
-        output.write(f.read())
-    
-    output.seek(0)
+        }, 404)
     
-    return app.response_class(
-        output.getvalue(),
+    # Stream the file straight from disk (uses the server's file wrapper/sendfile when available)
+    return send_file(
+        os.path.abspath(TRADE_LOG_FILE),
         mimetype='text/csv',
-        headers={'Content-Disposition': 'attachment;filename=trade_history.csv'}
+        as_attachment=True,
+        download_name='trade_history.csv'
     )
 
+app.register_blueprint(api)
+
 # Routes
 @app.route('/')
 def index():
     """Serve the main application page"""
-    return send_from_directory('static', 'index.html')
+    return send_from_directory('static', 'index.html', max_age=300)
 
 @app.route('/favicon.ico')
 def favicon():
     """Serve the favicon"""
-    return send_from_directory('static', 'favicon.ico')
+    return send_from_directory('static', 'favicon.ico', max_age=86400)
 
 @app.route('/health')
 def health_check():
     """Health check endpoint for monitoring"""
-    return jsonify({"status": "healthy"})
+    return app.response_class(HEALTH_BODY, mimetype='application/json')
 
 # Error handlers
 @app.errorhandler(404)
 def not_found_error(error):
     """Handle 404 errors"""
-    return jsonify({
-        'error': 'Not Found',
-        'message': 'The requested URL was not found on the server.'
-    }), 404
+    return app.response_class(NOT_FOUND_BODY, status=404, mimetype='application/json')
 
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
     app.logger.error(f"Server Error: {error}")
-    return jsonify({
-        'error': 'Internal Server Error',
-        'message': 'The server encountered an internal error and was unable to complete your request.'
-    }), 500
-
-# Start background threads when the app starts
-@app.before_first_request
-def before_first_request():
-    """Start background threads before first request"""
-    app.logger.info("Starting background threads")
-    start_background_threads()
-
-# Cleanup when the app shuts down
-@app.teardown_appcontext
-def teardown_appcontext(exception=None):
-    """Clean up resources when the app shuts down"""
-    app.logger.info("Shutting down background threads")
-    stop_background_threads()
+    return app.response_class(INTERNAL_ERROR_BODY, status=500, mimetype='application/json')
 
-# Run the app
+# Run the app (development server; use gunicorn in production, see README)
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # The reloader would re-import this module and start a second set of background threads
+    debug = os.environ.get('FLASK_ENV') == 'development'
+    app.run(host='0.0.0.0', port=5000, debug=debug, use_reloader=False)